@@ -0,0 +1,129 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""Streaming GraphML loader for the Streamlit explorer.
+
+``load_graphml_fast`` reads GraphML with lxml's ``iterparse`` instead of building the whole
+document tree. lxml is optional: when it is not installed the loader falls back to
+``nx.read_graphml``, which returns the same nodes and edges, only more slowly.
+"""
+
+import array
+
+import networkx as nx
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+_GRAPHML_TYPES = {
+    "int": int,
+    "long": int,
+    "float": float,
+    "double": float,
+    "string": str,
+    "boolean": lambda value: value.strip().lower() in ("true", "1"),
+}
+
+
+def _read_data(elem, keys):
+    """Decode the ``<data>`` children of a node or edge; empty ones become ``""`` like networkx."""
+    attrs = {}
+    for data in elem.iterchildren("{*}data"):
+        name, cast = keys.get(data.get("key"), (data.get("key"), str))
+        attrs[name] = "" if data.text is None else cast(data.text)
+    return attrs
+
+
+def _edge_key(edge_id, attrs):
+    """Return the multigraph key networkx uses for an edge: its id, as an int if possible."""
+    if not edge_id:
+        return attrs.get("key")
+    try:
+        return int(edge_id)
+    except ValueError:
+        return edge_id
+
+
+def load_graphml_fast(path):
+    """Read a GraphML file with the same nodes and edges ``nx.read_graphml`` would return.
+
+    The graph is directed if the file's ``edgedefault`` is ``directed``, and a multigraph
+    if the file contains parallel edges. Graph-level ``<data>`` and ``<key><default>``
+    values, which networkx stores in ``G.graph``, are not read.
+    """
+    if etree is None:
+        return nx.read_graphml(path)
+
+    keys = {}
+    directed = False
+    ids = []
+    index = {}
+    node_attrs = {}
+    src = array.array("q")
+    dst = array.array("q")
+    edge_attrs = []
+    edge_ids = []
+
+    def node_index(node):
+        if node not in index:
+            index[node] = len(ids)
+            ids.append(node)
+            node_attrs[node] = {}
+        return index[node]
+
+    for _, elem in etree.iterparse(
+        path, events=("end",), tag=("{*}key", "{*}node", "{*}edge", "{*}graph")
+    ):
+        tag = etree.QName(elem).localname
+        if tag == "key":
+            keys[elem.get("id")] = (
+                elem.get("attr.name", elem.get("id")),
+                _GRAPHML_TYPES.get(elem.get("attr.type"), str),
+            )
+        elif tag == "node":
+            node = elem.get("id")
+            node_index(node)
+            node_attrs[node].update(_read_data(elem, keys))
+        elif tag == "edge":
+            src.append(node_index(elem.get("source")))
+            dst.append(node_index(elem.get("target")))
+            edge_attrs.append(_read_data(elem, keys))
+            edge_ids.append(elem.get("id"))
+        else:
+            directed = elem.get("edgedefault") == "directed"
+
+        # Free the element and its already-processed siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    pairs = (
+        zip(src, dst, strict=True)
+        if directed
+        else ((min(u, v), max(u, v)) for u, v in zip(src, dst, strict=True))
+    )
+    multigraph = len(set(pairs)) < len(src)
+
+    if directed:
+        graph = nx.MultiDiGraph() if multigraph else nx.DiGraph()
+    else:
+        graph = nx.MultiGraph() if multigraph else nx.Graph()
+    graph.add_nodes_from((node, node_attrs[node]) for node in ids)
+    if multigraph:
+        # Edge ids become keys, as in networkx
+        graph.add_edges_from(
+            (ids[u], ids[v], _edge_key(edge_id, attrs), attrs)
+            for u, v, attrs, edge_id in zip(src, dst, edge_attrs, edge_ids, strict=True)
+        )
+    else:
+        # Edge ids are kept as an "id" attribute, as in networkx
+        for attrs, edge_id in zip(edge_attrs, edge_ids, strict=True):
+            if edge_id:
+                attrs["id"] = edge_id
+        graph.add_edges_from(
+            (ids[u], ids[v], attrs)
+            for u, v, attrs in zip(src, dst, edge_attrs, strict=True)
+        )
+    return graph
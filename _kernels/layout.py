@@ -0,0 +1,31 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""Numba kernels for the force-directed graph layout."""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit("f8(f8[:, ::1], f8[:, ::1])", parallel=True, fastmath=True, cache=True)
+def repulsion(pos, grad):
+    """Add the pairwise log-repulsion gradient to ``grad`` and return its energy.
+
+    The energy is ``-sum_{i<j} log ||pos_i - pos_j||``. Each row of ``grad`` is
+    only written by the thread that owns it, so the outer loop runs in parallel.
+    """
+    n, dim = pos.shape
+    log_sum = 0.0
+    for i in prange(n):
+        for j in range(n):
+            if i == j:
+                continue
+            r2 = 0.0
+            for d in range(dim):
+                delta = pos[i, d] - pos[j, d]
+                r2 += delta * delta
+            for d in range(dim):
+                grad[i, d] -= (pos[i, d] - pos[j, d]) / r2
+            log_sum += np.log(r2)
+    # Every pair is visited twice and log ||x|| == 0.5 * log ||x||^2
+    return -0.25 * log_sum
@@ -2,43 +2,60 @@
 """Utility script to check for GraphML files in the output directory."""
 
 import os
-from pathlib import Path
 import argparse
 import glob
 import datetime
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+def _scan_ts(ts_dir):
+    """Return the GraphML files in the artifacts directory of one timestamp directory."""
+    try:
+        entries = os.scandir(os.path.join(ts_dir.path, "artifacts"))
+    except OSError:
+        # Missing or unreadable artifacts directory: skip this run, as Path.glob did
+        return []
+    with entries:
+        files = [entry for entry in entries
+                 if entry.name.endswith(".graphml") and entry.is_file(follow_symlinks=False)]
+    
+    graphml_files = []
+    for file in files:
+        # DirEntry caches its stat result, so this is the only syscall per file
+        stat = file.stat()
+        graphml_files.append({
+            "path": file.path,
+            "timestamp_dir": ts_dir.name,
+            "_mtime": stat.st_mtime,
+            "size_kb": stat.st_size / 1024
+        })
+    return graphml_files
 
 def find_graphml_files(root_dir):
     """Find all GraphML files in the output directory."""
-    output_dir = Path(root_dir) / "output"
-    if not output_dir.exists():
+    output_dir = os.path.join(root_dir, "output")
+    if not os.path.isdir(output_dir):
         print(f"Output directory not found: {output_dir}")
         return []
     
     print(f"Checking output directory: {output_dir}")
     
     # List all timestamp directories
-    timestamp_dirs = [d for d in output_dir.iterdir() if d.is_dir()]
+    with os.scandir(output_dir) as it:
+        timestamp_dirs = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
     if not timestamp_dirs:
         print("No timestamp directories found.")
         return []
     
-    graphml_files = []
-    
-    for ts_dir in timestamp_dirs:
-        artifacts_dir = ts_dir / "artifacts"
-        if artifacts_dir.exists():
-            files = list(artifacts_dir.glob("*.graphml"))
-            if files:
-                for file in files:
-                    modified_time = datetime.datetime.fromtimestamp(file.stat().st_mtime)
-                    graphml_files.append({
-                        "path": str(file),
-                        "timestamp_dir": str(ts_dir.name),
-                        "modified": modified_time.strftime("%Y-%m-%d %H:%M:%S"),
-                        "size_kb": file.stat().st_size / 1024
-                    })
+    # Directory reads are I/O bound, so scan many runs concurrently
+    if len(timestamp_dirs) < 4:
+        graphml_files = list(itertools.chain.from_iterable(map(_scan_ts, timestamp_dirs)))
+    else:
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            graphml_files = list(itertools.chain.from_iterable(pool.map(_scan_ts, timestamp_dirs)))
                     
-    return sorted(graphml_files, key=lambda x: x["modified"], reverse=True)
+    return sorted(graphml_files, key=itemgetter("_mtime"), reverse=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Check for GraphML files in the output directory.")
@@ -53,7 +70,8 @@ if __name__ == "__main__":
         print(f"{'Path':<60} {'Modified':<20} {'Size (KB)':<10}")
         print("-" * 80)
         for file in files:
-            print(f"{file['path']:<60} {file['modified']:<20} {file['size_kb']:<10.2f}")
+            modified = datetime.datetime.fromtimestamp(file["_mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{file['path']:<60} {modified:<20} {file['size_kb']:<10.2f}")
     else:
         print("\nNo GraphML files found. Make sure:")
         print("1. You've run the indexing process (python -m graphrag.index --root ./ragtest)")
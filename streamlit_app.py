@@ -1,13 +1,27 @@
 import streamlit as st
+import collections
 import os
 import subprocess
+import tempfile
+import threading
 import networkx as nx
 import plotly.graph_objects as go
 import numpy as np
+from scipy.optimize import minimize
+from scipy.sparse.csgraph import connected_components
 import json
 from pathlib import Path
 import time
 
+from _kernels.graphml import load_graphml_fast
+from _kernels.layout import repulsion
+
+# Above this many edges only a degree-weighted sample is drawn
+MAX_EDGES = 20000
+
+# Number of query responses kept in the shared query cache
+QUERY_CACHE_SIZE = 128
+
 st.set_page_config(page_title="GraphRAG Knowledge Graph Explorer", layout="wide")
 
 # Title and description
@@ -26,97 +40,259 @@ community_level = st.sidebar.slider("Community Level", min_value=0, max_value=5,
 response_type = st.sidebar.text_input("Response Type", value="Multiple Paragraphs",
                                     help="Format of the response (e.g., Multiple Paragraphs, Single Paragraph, List of 3-7 Points)")
 
-# Function to run graphRAG query and get the response
-@st.cache_data
+# Cache hit and miss counters are per session; the cached query responses are shared
+if "query_cache_stats" not in st.session_state:
+    st.session_state["query_cache_stats"] = {"hits": 0, "misses": 0}
+if "visualize_cache_stats" not in st.session_state:
+    st.session_state["visualize_cache_stats"] = {"calls": 0, "misses": 0}
+
+# Function to get the query response cache shared by all sessions, evicted least recently used
+@st.cache_resource
+def _query_cache():
+    return collections.OrderedDict(), threading.Lock()
+
+# Function to run graphRAG query and stream its output line by line
+def _stream_graphrag_query(query, method):
+    with tempfile.TemporaryFile(mode="w+") as stderr, subprocess.Popen(
+        ["python", "-m", "graphrag.query", "--root", root_dir, "--method", method, 
+         "--community_level", str(community_level), "--response_type", response_type, query],
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        bufsize=1,
+        text=True
+    ) as proc:
+        yield from iter(proc.stdout.readline, "")
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr.read())
+
+# Function to run graphRAG query, display the response as it arrives and cache it
 def run_graphrag_query(query, method="global"):
+    key = (query, method, community_level, response_type, root_dir)
+    cache, lock = _query_cache()
+    stats = st.session_state["query_cache_stats"]
+    with lock:
+        response = cache.get(key)
+        if response is not None:
+            cache.move_to_end(key)
+    if response is not None:
+        stats["hits"] += 1
+        st.write(response)
+        return response
+    
+    stats["misses"] += 1
     try:
-        result = subprocess.run(
-            ["python", "-m", "graphrag.query", "--root", root_dir, "--method", method, 
-             "--community_level", str(community_level), "--response_type", response_type, query],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        # Process completed. Check if we got a meaningful response
-        if not result.stdout.strip():
-            return "The query completed but returned no results."
-        return result.stdout
+        response = st.write_stream(_stream_graphrag_query(query, method))
     except subprocess.CalledProcessError as e:
-        return f"Error: {e.stderr}"
+        # Failed queries are not cached so they can be retried
+        response = f"Error: {e.stderr}"
+        st.write(response)
+        return response
+    
+    # Process completed. Check if we got a meaningful response
+    if not (response and response.strip()):
+        response = "The query completed but returned no results."
+        st.write(response)
+    with lock:
+        cache[key] = response
+        cache.move_to_end(key)
+        while len(cache) > QUERY_CACHE_SIZE:
+            cache.popitem(last=False)
+    return response
 
-# Function to load the GraphML file
-@st.cache_data
-def find_latest_graphml():
-    output_dir = Path(root_dir) / "output"
-    if not output_dir.exists():
+# Function to find the latest GraphML file. Not cached: the probe is cheap, and every
+# "Load/Refresh Graph" click should see new runs and the current root directory.
+def find_latest_graphml(root_dir):
+    output_dir = os.path.join(root_dir, "output")
+    if not os.path.isdir(output_dir):
         return None
     
-    # Find the most recent timestamp directory
-    timestamp_dirs = [d for d in output_dir.iterdir() if d.is_dir()]
-    if not timestamp_dirs:
-        return None
+    # Timestamp directories are named YYYYMMDD-HHMMSS, so name order is age order.
+    # Probe from the newest run and stop at the first one with a graph.
+    with os.scandir(output_dir) as it:
+        timestamp_dirs = sorted((entry for entry in it if entry.is_dir(follow_symlinks=False)),
+                                key=lambda entry: entry.name, reverse=True)
+    
+    for ts_dir in timestamp_dirs:
+        artifacts_dir = os.path.join(ts_dir.path, "artifacts")
+        graphml_path = os.path.join(artifacts_dir, "summarized_graph.graphml")
+        if os.path.exists(graphml_path):
+            return graphml_path
+        
+        # Look for any graphml file if the standard one isn't found
+        try:
+            entries = os.scandir(artifacts_dir)
+        except OSError:
+            # Missing or unreadable artifacts directory: skip this run, as Path.glob did
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(".graphml") and entry.is_file(follow_symlinks=False):
+                    return entry.path
+    
+    return None
+
+# Function to compute a force-directed layout by minimising the layout energy with L-BFGS
+def _lbfgs_layout(A, dim=3, seed=42, maxiter=100, gravity=0.01):
+    n = A.shape[0]
+    degrees = np.asarray(A.sum(axis=1)).ravel()
+    X0 = np.random.default_rng(seed).random((n, dim))
+    
+    def energy(X_flat):
+        X = X_flat.reshape(n, dim)
+        
+        # Attraction along edges: 0.5 * sum_ij A_ij * ||xi - xj||^2 == tr(X^T L X)
+        LX = degrees[:, None] * X - A @ X
+        E = np.sum(X * LX)
+        grad = 2 * LX
+        
+        # Repulsion between all pairs: -sum_{i<j} log ||xi - xj||
+        E += repulsion(X, grad)
+        
+        # Weak pull towards the origin keeps disconnected components in view
+        E += 0.5 * gravity * np.sum(X * X)
+        grad += gravity * X
+        
+        return E, grad.ravel()
     
-    latest_dir = max(timestamp_dirs, key=lambda d: d.stat().st_mtime)
-    graphml_path = latest_dir / "artifacts" / "summarized_graph.graphml"
+    result = minimize(energy, X0.ravel(), jac=True, method="L-BFGS-B", options={"maxiter": maxiter})
+    return nx.rescale_layout(result.x.reshape(n, dim))
+
+# Function to parse the graph once and compute its 3D layout, per-node attributes and
+# statistics, persisted to disk across reruns. The fingerprint changes whenever the GraphML
+# file is rewritten. max_entries only bounds the in-memory copies; persisted layouts of old
+# versions are pruned by visualize_graph.
+@st.cache_data(persist="disk", max_entries=4)
+def _compute_layout(graphml_path, fingerprint):
+    graph = load_graphml_fast(graphml_path)
     
-    if graphml_path.exists():
-        return str(graphml_path)
+    # Empty <data> weights are read as "" (as nx.read_graphml does); treat those edges as unweighted
+    for *_, data in graph.edges(data=True):
+        if data.get("weight") == "":
+            del data["weight"]
     
-    # Look for any graphml file if the standard one isn't found
-    artifacts_dir = latest_dir / "artifacts"
-    if artifacts_dir.exists():
-        graphml_files = list(artifacts_dir.glob("*.graphml"))
-        if graphml_files:
-            return str(graphml_files[0])
+    node_ids = np.array(list(graph.nodes()), dtype=object)
+    if len(node_ids) == 0:
+        # nx.to_scipy_sparse_array raises on a graph without nodes
+        node_attrs = {"community": None, "text": np.empty(0, dtype=object)}
+        stats = {"nodes": 0, "edges": 0, "components": 0}
+        return np.empty((0, 3), dtype=np.float32), node_ids, np.empty((0, 2), dtype=np.int64), node_attrs, stats
     
-    return None
+    A = nx.to_scipy_sparse_array(graph, format="csr")
+    if graph.is_directed():
+        A = A + A.T
+    
+    # The optimiser works in float64; the plot only needs float32
+    pos_array = _lbfgs_layout(A, dim=3, seed=42).astype(np.float32)
+    
+    # Edges as pairs of row indices into pos_array
+    idx = {node: i for i, node in enumerate(node_ids)}
+    edge_pairs = np.fromiter((idx[node] for edge in graph.edges() for node in edge),
+                             dtype=np.int64).reshape(-1, 2)
+    
+    # Community and hover text in a single pass over the node data, aligned with node_ids
+    n = len(node_ids)
+    community = np.empty(n, dtype=object)
+    node_text = np.empty(n, dtype=object)
+    clustered = False
+    for i, (node, data) in enumerate(graph.nodes(data=True)):
+        if i == 0:
+            clustered = 'community' in data
+        community[i] = data.get('community', 0)
+        node_text[i] = f"Node: {node}<br>Type: {data.get('type', 'N/A')}<br>Description: {data.get('description', 'N/A')}"
+    
+    # Color by community only if the graph was clustered
+    node_attrs = {"community": community if clustered else None, "text": node_text}
+    
+    stats = {
+        "nodes": n,
+        "edges": graph.number_of_edges(),
+        "components": connected_components(A, directed=False, return_labels=False),
+    }
+    
+    return pos_array, node_ids, edge_pairs, node_attrs, stats
 
-# Function to visualize the graph
-@st.cache_data
-def visualize_graph(graphml_path):
+# Function to get the last layout fingerprint seen for each GraphML path in this process
+@st.cache_resource
+def _layout_fingerprints():
+    return {}
+
+# Function to build the cache key for a GraphML file. Resolving the path lets relative and
+# absolute spellings share an entry; mtime and size invalidate it when the file is rewritten.
+def _graphml_key(graphml_path):
     if not graphml_path or not os.path.exists(graphml_path):
         return None
+    path = Path(graphml_path).resolve()
+    stat = path.stat()
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+# Function to get the visualize_graph cache hits and misses for this session
+def get_stats():
+    stats = st.session_state["visualize_cache_stats"]
+    return {"hits": stats["calls"] - stats["misses"], "misses": stats["misses"]}
+
+# Function to visualize the graph identified by a _graphml_key tuple. Each rewrite of the
+# file is a new key, so only the figures of the most recent versions are kept.
+@st.cache_data(max_entries=4)
+def visualize_graph(graph_key):
+    # Only runs on a cache miss
+    st.session_state["visualize_cache_stats"]["misses"] += 1
+    if graph_key is None:
+        return None, None
     
-    graph = nx.read_graphml(graphml_path)
+    graphml_path, mtime_ns, size = graph_key
+    fingerprint = f"{mtime_ns}:{size}"
+    fingerprints = _layout_fingerprints()
+    if fingerprints.get(graphml_path, fingerprint) != fingerprint:
+        # The file was rewritten; drop the persisted layouts of its older versions
+        _compute_layout.clear()
+    fingerprints[graphml_path] = fingerprint
+    pos_array, node_ids, edge_pairs, node_attrs, stats = _compute_layout(graphml_path, fingerprint)
     
-    # Create a 3D spring layout
-    pos = nx.spring_layout(graph, dim=3, seed=42, k=0.5)
+    # Extract node positions. float32 arrays are sent to the browser as base64 typed arrays.
+    x_nodes, y_nodes, z_nodes = np.ascontiguousarray(pos_array.T)
     
-    # Extract node positions
-    x_nodes = [pos[node][0] for node in graph.nodes()]
-    y_nodes = [pos[node][1] for node in graph.nodes()]
-    z_nodes = [pos[node][2] for node in graph.nodes()]
+    # Node degrees from the edge index pairs (self-loops count twice, as in graph.degree)
+    deg = np.bincount(edge_pairs.ravel(), minlength=len(node_ids))
     
-    # Extract edge positions
-    x_edges = []
-    y_edges = []
-    z_edges = []
+    # Downsample edges on large graphs, preferring edges between well-connected nodes
+    shown_edges = edge_pairs
+    if len(edge_pairs) > MAX_EDGES:
+        p = (deg[edge_pairs[:, 0]] + deg[edge_pairs[:, 1]]).astype(np.float64)
+        p /= p.sum()
+        keep = np.random.default_rng(0).choice(len(edge_pairs), size=MAX_EDGES, replace=False, p=p)
+        shown_edges = edge_pairs[keep]
     
-    for edge in graph.edges():
-        x_edges.extend([pos[edge[0]][0], pos[edge[1]][0], None])
-        y_edges.extend([pos[edge[0]][1], pos[edge[1]][1], None])
-        z_edges.extend([pos[edge[0]][2], pos[edge[1]][2], None])
+    # Extract edge positions as (start, end, NaN) segments; NaN breaks the line like None
+    seg = np.empty((len(shown_edges), 3, 3), dtype=np.float32)
+    seg[:, 0] = pos_array[shown_edges[:, 0]]
+    seg[:, 1] = pos_array[shown_edges[:, 1]]
+    seg[:, 2] = np.nan
+    x_edges = seg[..., 0].ravel()
+    y_edges = seg[..., 1].ravel()
+    z_edges = seg[..., 2].ravel()
     
     # Generate node colors based on communities or degree
-    if 'community' in next(iter(graph.nodes(data=True)))[1]:
-        # Use community for coloring
-        communities = list(set(data['community'] for _, data in graph.nodes(data=True) if 'community' in data))
-        community_to_int = {c: i for i, c in enumerate(communities)}
-        node_colors = [community_to_int.get(graph.nodes[node].get('community', 0), 0) 
-                       for node in graph.nodes()]
+    if node_attrs["community"] is not None:
+        # Use community for coloring. Labels keep their natural order (numeric ids sort
+        # numerically) and are only compared as strings when their types are mixed.
+        community = node_attrs["community"]
+        if len({type(c) for c in community}) > 1:
+            community = community.astype(str)
+        _, node_colors = np.unique(community, return_inverse=True)
         colorbar_title = 'Community'
     else:
         # Use degree for coloring
-        node_colors = [graph.degree(node) for node in graph.nodes()]
+        node_colors = deg
         colorbar_title = 'Node Degree'
     
     # Normalize colors
-    node_colors = np.array(node_colors)
+    node_colors = np.asarray(node_colors, dtype=np.float32)
     if node_colors.size > 0 and node_colors.max() != node_colors.min():
         node_colors = (node_colors - node_colors.min()) / (node_colors.max() - node_colors.min())
     
     # Get node sizes based on degree
-    node_sizes = [5 + 3 * graph.degree(node) for node in graph.nodes()]
+    node_sizes = (5 + 3 * deg).astype(np.float32)
     
     # Create the trace for edges
     edge_trace = go.Scatter3d(
@@ -141,8 +317,7 @@ def visualize_graph(graphml_path):
             ),
             line=dict(width=1)
         ),
-        text=[f"Node: {node}<br>Type: {graph.nodes[node].get('type', 'N/A')}<br>Description: {graph.nodes[node].get('description', 'N/A')}" 
-              for node in graph.nodes()],
+        text=node_attrs["text"],
         hoverinfo='text'
     )
     
@@ -162,7 +337,18 @@ def visualize_graph(graphml_path):
         height=700
     )
     
-    return fig
+    # Graph statistics come from the cached parse, so the caller doesn't have to parse the file again
+    stats = {**stats, "edges_shown": len(shown_edges)}
+    
+    return fig, stats
+
+# Function to read the GraphML file for download; the file is only re-read when it changes.
+# cache_resource hands back the same bytes object on every rerun instead of a copy, and
+# only the current version of the file is kept in memory.
+@st.cache_resource(max_entries=1)
+def _read_graphml_bytes(graphml_path, mtime_ns, size):
+    with open(graphml_path, 'rb') as f:
+        return f.read()
 
 # Create tabs for different functionalities
 query_tab, visualize_tab = st.tabs(["Query Knowledge Graph", "Visualize Knowledge Graph"])
@@ -185,9 +371,8 @@ with query_tab:
     if st.button("Submit Query"):
         if query:
             with st.spinner(f"Running {search_method} search..."):
-                response = run_graphrag_query(query, method=search_method)
                 st.subheader("Response:")
-                st.write(response)
+                run_graphrag_query(query, method=search_method)
         else:
             st.warning("Please enter a query to search.")
 
@@ -197,7 +382,7 @@ with visualize_tab:
     # Button to refresh graph
     if st.button("Load/Refresh Graph"):
         with st.spinner("Loading graph..."):
-            graphml_path = find_latest_graphml()
+            graphml_path = find_latest_graphml(root_dir)
             if graphml_path:
                 st.session_state['graphml_path'] = graphml_path
                 st.success(f"Loaded graph from: {graphml_path}")
@@ -207,26 +392,26 @@ with visualize_tab:
     # Display the graph if available
     if 'graphml_path' in st.session_state:
         with st.spinner("Generating visualization..."):
-            fig = visualize_graph(st.session_state['graphml_path'])
+            graph_key = _graphml_key(st.session_state['graphml_path'])
+            st.session_state["visualize_cache_stats"]["calls"] += 1
+            fig, stats = visualize_graph(graph_key)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
+                if stats["edges_shown"] < stats["edges"]:
+                    st.caption(f"Showing a sample of {stats['edges_shown']:,} of {stats['edges']:,} edges.")
                 
                 # Display graph statistics
-                graph = nx.read_graphml(st.session_state['graphml_path'])
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Nodes", len(graph.nodes))
+                    st.metric("Nodes", stats["nodes"])
                 with col2:
-                    st.metric("Edges", len(graph.edges))
+                    st.metric("Edges", stats["edges"])
                 with col3:
-                    if nx.is_connected(graph):
-                        st.metric("Connected Components", 1)
-                    else:
-                        st.metric("Connected Components", nx.number_connected_components(graph))
+                    st.metric("Connected Components", stats["components"])
                 
                 # Export options
                 if st.download_button("Download Graph as GraphML", 
-                                    data=open(st.session_state['graphml_path'], 'rb').read(),
+                                    data=_read_graphml_bytes(*graph_key),
                                     file_name="knowledge_graph.graphml"):
                     st.success("Download started!")
             else:
@@ -234,6 +419,13 @@ with visualize_tab:
     else:
         st.info("Click 'Load/Refresh Graph' to load and visualize the knowledge graph.")
 
+# Cache statistics, rendered last so they include this run's query and graph
+st.sidebar.metric("Query Cache Hits", st.session_state["query_cache_stats"]["hits"])
+st.sidebar.metric("Query Cache Misses", st.session_state["query_cache_stats"]["misses"])
+graph_cache_stats = get_stats()
+st.sidebar.metric("Graph Cache Hits", graph_cache_stats["hits"])
+st.sidebar.metric("Graph Cache Misses", graph_cache_stats["misses"])
+
 # Footer
 st.markdown("---")
 st.caption("GraphRAG Knowledge Graph Explorer - Built with Streamlit")
@@ -0,0 +1,78 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+import networkx as nx
+import pytest
+
+from _kernels.graphml import load_graphml_fast
+
+pytest.importorskip("lxml")
+
+EMPTY_DATA_GRAPHML = """<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d0" for="edge" attr.name="weight" attr.type="double"/>
+  <key id="d1" for="node" attr.name="type" attr.type="string"/>
+  <graph edgedefault="undirected">
+    <node id="a"><data key="d1"/></node>
+    <node id="b"><data key="d1">PERSON</data></node>
+    <edge id="e0" source="a" target="b"><data key="d0"/></edge>
+  </graph>
+</graphml>
+"""
+
+
+def assert_matches_networkx(path):
+    expected = nx.read_graphml(path)
+    actual = load_graphml_fast(path)
+
+    assert type(actual) is type(expected)
+    assert list(actual.nodes(data=True)) == list(expected.nodes(data=True))
+    if expected.is_multigraph():
+        assert nx.utils.edges_equal(
+            actual.edges(keys=True, data=True), expected.edges(keys=True, data=True)
+        )
+    else:
+        assert nx.utils.edges_equal(actual.edges(data=True), expected.edges(data=True))
+
+
+def test_undirected_graph_with_attributes(tmp_path):
+    graph = nx.Graph()
+    graph.add_node(
+        "SCROOGE", type="PERSON", description="A miser", degree=3, community=1
+    )
+    graph.add_node(
+        "MARLEY", type="PERSON", description="A ghost", degree=1, community=1
+    )
+    graph.add_node("LONDON", type="GEO", rank=0.5, visited=True)
+    graph.add_node("ISOLATED")
+    graph.add_edge("SCROOGE", "MARLEY", weight=2.0, description="Former partners")
+    graph.add_edge("SCROOGE", "LONDON", weight=1.0, source_id="1,2")
+    path = tmp_path / "graph.graphml"
+    nx.write_graphml(graph, path)
+
+    assert_matches_networkx(path)
+
+
+def test_directed_graph(tmp_path):
+    graph = nx.DiGraph([("a", "b"), ("b", "a"), ("b", "c")])
+    path = tmp_path / "graph.graphml"
+    nx.write_graphml(graph, path)
+
+    assert_matches_networkx(path)
+
+
+def test_parallel_edges(tmp_path):
+    graph = nx.MultiGraph()
+    graph.add_edge("a", "b", weight=1.0)
+    graph.add_edge("b", "a", weight=2.0)
+    graph.add_edge("b", "c", weight=3.0)
+    path = tmp_path / "graph.graphml"
+    nx.write_graphml(graph, path)
+
+    assert_matches_networkx(path)
+
+
+def test_empty_data_elements(tmp_path):
+    path = tmp_path / "graph.graphml"
+    path.write_text(EMPTY_DATA_GRAPHML)
+
+    assert_matches_networkx(path)
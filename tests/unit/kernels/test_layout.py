@@ -0,0 +1,60 @@
+# Copyright (c) 2024 Microsoft Corporation.
+# Licensed under the MIT License
+import numpy as np
+import pytest
+from scipy.spatial.distance import pdist, squareform
+
+pytest.importorskip("numba")
+layout = pytest.importorskip("_kernels.layout")
+
+
+def random_positions(n=12, dim=3, seed=0):
+    return np.random.default_rng(seed).random((n, dim))
+
+
+def reference_repulsion(pos):
+    """Energy and gradient of -sum_{i<j} log ||pos_i - pos_j|| using pdist."""
+    r2 = pdist(pos, "sqeuclidean")
+    energy = -0.5 * np.sum(np.log(r2))
+    weights = squareform(1.0 / r2)
+    grad = -(weights.sum(axis=1)[:, None] * pos - weights @ pos)
+    return energy, grad
+
+
+def test_repulsion_matches_pdist_reference():
+    pos = random_positions()
+    grad = np.zeros_like(pos)
+
+    energy = layout.repulsion(pos, grad)
+
+    expected_energy, expected_grad = reference_repulsion(pos)
+    assert energy == pytest.approx(expected_energy, rel=1e-9)
+    np.testing.assert_allclose(grad, expected_grad, rtol=1e-9)
+
+
+def test_repulsion_adds_to_existing_gradient():
+    pos = random_positions()
+    grad = np.ones_like(pos)
+
+    layout.repulsion(pos, grad)
+
+    _, expected_grad = reference_repulsion(pos)
+    np.testing.assert_allclose(grad, expected_grad + 1.0, rtol=1e-9)
+
+
+def test_repulsion_gradient_matches_finite_differences():
+    pos = random_positions(n=6)
+    grad = np.zeros_like(pos)
+    layout.repulsion(pos, grad)
+
+    eps = 1e-6
+    numeric = np.empty_like(pos)
+    for i in range(pos.shape[0]):
+        for d in range(pos.shape[1]):
+            step = np.zeros_like(pos)
+            step[i, d] = eps
+            plus = layout.repulsion(pos + step, np.zeros_like(pos))
+            minus = layout.repulsion(pos - step, np.zeros_like(pos))
+            numeric[i, d] = (plus - minus) / (2 * eps)
+
+    np.testing.assert_allclose(grad, numeric, rtol=1e-5, atol=1e-6)